@@ -5,114 +5,278 @@ Chess Game Manager - Comprehensive chess board management with game state tracki
 
 import chess
 import chess.pgn
+import chess.polyglot
 import json
-from typing import List, Dict, Any, Optional
+import logging
+import re
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from google.adk.tools.tool_context import ToolContext
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+
+# Template starting position, copied instead of rebuilt for each new board
+_STARTING_BOARD = chess.Board()
+
+# Cheap structural check of the piece placement field (eight ranks of pieces/digits)
+_FEN_PLACEMENT_RE = re.compile(r'^\s*(?:[pnbrqkPNBRQK1-8~]+/){7}[pnbrqkPNBRQK1-8~]+(?:\s|$)')
+
+# Polyglot-compatible hasher used for incremental position keys
+_ZOBRIST = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+# Outcome terminations mapped onto the end_reason() vocabulary
+_DRAW_REASONS = {
+    chess.Termination.STALEMATE: "stalemate_draw",
+    chess.Termination.INSUFFICIENT_MATERIAL: "insufficient_material_draw",
+    chess.Termination.SEVENTYFIVE_MOVES: "75_move_rule_draw",
+    chess.Termination.FIVEFOLD_REPETITION: "repetition_draw",
+}
+
+
+def _encode_move(move: chess.Move) -> int:
+    """Pack a move into 16 bits: from (6) | to (6) | promotion piece type (3)."""
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def _decode_move(code: int) -> chess.Move:
+    """Unpack a move produced by _encode_move."""
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, (code >> 12) or None)
+
+
+def _square_keys(board: chess.Board, squares: Sequence[int]) -> int:
+    """XOR of the Polyglot piece keys for whatever stands on the given squares."""
+    key = 0
+    for square in squares:
+        piece = board.piece_at(square)
+        if piece:
+            # Polyglot piece index: black pawn 0, white pawn 1, ..., white king 11
+            key ^= _ZOBRIST.array[64 * (2 * (piece.piece_type - 1) + piece.color) + square]
+    return key
+
+
+def _state_hash(board: chess.Board) -> int:
+    """Hash the non-placement parts of a position (castling, en passant, turn)."""
+    return _ZOBRIST.hash_castling(board) ^ _ZOBRIST.hash_ep_square(board) ^ _ZOBRIST.hash_turn(board)
+
 
 class ChessGameManager:
     """Comprehensive chess board management with game state tracking"""
     
-    _instances = {}  # browser_id -> ChessGameManager instance
-    
-    def __new__(cls, browser_id: str = None):
-        if browser_id is None:
-            # Fallback for direct instantiation (legacy)
-            return super().__new__(cls)
-        
-        if browser_id not in cls._instances:
-            cls._instances[browser_id] = super().__new__(cls)
-        return cls._instances[browser_id]
-    
-    def __init__(self, browser_id: str = None):
-        if not hasattr(self, '_initialized'):
-            self.board = chess.Board()
-            self._move_history = []
-            self._game_metadata = {
-                "start_time": None,
-                "end_time": None,
-                "result": None
-            }
-            self._initialized = True
-    
-    @classmethod
-    def get_for_browser(cls, browser_id: str):
-        """Get ChessGameManager instance for specific browser session"""
-        return cls(browser_id)
-    
-    def reset_game(self):
-        """Reset the game to starting position"""
-        self.board = chess.Board()
-        self._move_history = []
+    __slots__ = (
+        "board", "dirty", "_move_history", "_game_metadata",
+        "_fen_cache", "_legal_cache", "_state_cache", "_zobrist", "_rep_counts",
+        "_san_history", "_pgn_game", "_pgn_node", "__weakref__",
+    )
+    
+    # browser_id -> ChessGameManager instance, dropped once nothing references it
+    _instances = weakref.WeakValueDictionary()
+    # Strong references to the most recently used sessions so live games survive between tool calls
+    _recent = OrderedDict()
+    _max_recent = 64
+    # Browser ids recently pushed out of _recent, to report games lost to eviction
+    _evicted = OrderedDict()
+    _max_evicted = 1024
+    
+    def __init__(self):
+        self.board = _STARTING_BOARD.copy(stack=False)
+        self._move_history = array('H')  # moves packed with _encode_move
         self._game_metadata = {
             "start_time": None,
             "end_time": None,
             "result": None
         }
+        self.dirty = False
+        self._rehash()
+        self._reset_records()
+    
+    @classmethod
+    def get_for_browser(cls, browser_id: str):
+        """Get ChessGameManager instance for specific browser session"""
+        instance = cls._instances.get(browser_id)
+        if instance is None:
+            if cls._evicted.pop(browser_id, None) is not None:
+                logger.warning(
+                    "Game manager for browser %s was evicted after %d newer sessions; "
+                    "starting it over from the initial position", browser_id, cls._max_recent
+                )
+            instance = cls()
+            cls._instances[browser_id] = instance
+        cls._recent[browser_id] = instance
+        cls._recent.move_to_end(browser_id)
+        if len(cls._recent) > cls._max_recent:
+            evicted_id, _ = cls._recent.popitem(last=False)
+            cls._evicted[evicted_id] = True
+            if len(cls._evicted) > cls._max_evicted:
+                cls._evicted.popitem(last=False)
+        return instance
+    
+    def _invalidate_caches(self) -> None:
+        """Drop per-position memoized values after the board changes."""
+        self._fen_cache = None
+        self._legal_cache = None
+        self._state_cache = None
+    
+    def _rehash(self) -> None:
+        """Recompute the Zobrist key from scratch and restart repetition counts."""
+        self._invalidate_caches()
+        self._zobrist = chess.polyglot.zobrist_hash(self.board)
+        self._rep_counts = {self._zobrist: 1}
+    
+    def _reset_records(self) -> None:
+        """Start fresh SAN and PGN records from the current position."""
+        self._san_history = []
+        self._pgn_game = chess.pgn.Game()
+        self._pgn_game.setup(self.board)
+        self._pgn_node = self._pgn_game
+    
+    def _replay_records(self) -> None:
+        """Rebuild SAN and PGN records by replaying the UCI history from the start."""
+        temp_board = _STARTING_BOARD.copy(stack=False)
+        self._san_history = []
+        self._pgn_game = chess.pgn.Game()
+        self._pgn_node = self._pgn_game
+        for code in self._move_history:
+            move = _decode_move(code)
+            self._san_history.append(temp_board.san(move))
+            self._pgn_node = self._pgn_node.add_variation(move)
+            temp_board.push(move)
+    
+    def _push(self, move: chess.Move) -> None:
+        """Push a legal move, updating the Zobrist key and SAN/PGN records incrementally."""
+        self._san_history.append(self.board.san(move))
+        self._pgn_node = self._pgn_node.add_variation(move)
+        board = self.board
+        # Only the squares the move touches change, so only their piece keys are swapped
+        if board.is_castling(move):
+            touched = list(chess.SquareSet(chess.BB_RANK_1 if board.turn else chess.BB_RANK_8))
+        elif board.is_en_passant(move):
+            captured = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+            touched = [move.from_square, move.to_square, captured]
+        else:
+            touched = [move.from_square, move.to_square]
+        key = self._zobrist ^ _state_hash(board) ^ _square_keys(board, touched)
+        board.push(move)
+        self._invalidate_caches()
+        self._zobrist = key ^ _square_keys(board, touched) ^ _state_hash(board)
+        self._rep_counts[self._zobrist] = self._rep_counts.get(self._zobrist, 0) + 1
+    
+    def zobrist_key(self) -> int:
+        """Return the Polyglot Zobrist key of the current position."""
+        return self._zobrist
+    
+    def repetition_count(self) -> int:
+        """Return how often the current position has occurred in this game."""
+        return self._rep_counts.get(self._zobrist, 0)
+    
+    def _parse_legal(self, uci: str) -> Optional[chess.Move]:
+        """Parse a UCI move legal in the current position, or return None."""
+        try:
+            # parse_uci validates legality against the current position
+            move = self.board.parse_uci(uci)
+        except (ValueError, chess.InvalidMoveError, chess.IllegalMoveError):
+            return None
+        # Null moves ("0000") are never legal here, and parse_uci also rewrites
+        # king-takes-rook (e1h1) into castling; only the canonical spelling is accepted
+        if not move or move.uci() != uci:
+            return None
+        return move
     
     def make_move(self, uci: str) -> bool:
         """Apply UCI move to board. Returns True if successful."""
-        try:
-            move = chess.Move.from_uci(uci)
-            if move in self.board.legal_moves:
-                self.board.push(move)
-                self._move_history.append(uci)
-                return True
-            return False
-        except:
+        move = self._parse_legal(uci)
+        if move is None:
             return False
+        self._push(move)
+        self._move_history.append(_encode_move(move))
+        self.dirty = True
+        return True
     
     def get_fen(self) -> str:
         """Return current board position as FEN string."""
-        return self.board.fen()
+        if self._fen_cache is None:
+            self._fen_cache = self.board.fen()
+        return self._fen_cache
     
     def is_legal_move(self, uci: str) -> bool:
         """Check if UCI move is legal in current position."""
-        try:
-            move = chess.Move.from_uci(uci)
-            return move in self.board.legal_moves
-        except:
-            return False
+        return self._parse_legal(uci) is not None
     
     def get_legal_moves(self) -> List[str]:
         """Return list of all legal moves in UCI format."""
-        return [move.uci() for move in self.board.legal_moves]
+        if self._legal_cache is None:
+            self._legal_cache = tuple(move.uci() for move in self.board.legal_moves)
+        return list(self._legal_cache)
+    
+    def legal_move_count(self) -> int:
+        """Return the number of legal moves without building UCI strings."""
+        if self._legal_cache is not None:
+            return len(self._legal_cache)
+        return self.board.legal_moves.count()
     
     def is_gameover(self) -> bool:
         """Check if game has ended."""
-        return self.board.is_game_over()
+        return self.classify_state()[0]
+    
+    def classify_state(self) -> Tuple[bool, str]:
+        """Return (game_over, reason), checking end conditions in board.outcome() order."""
+        if self._state_cache is None:
+            board = self.board
+            if self._legal_cache is not None:
+                has_moves = bool(self._legal_cache)
+            else:
+                has_moves = any(board.generate_legal_moves())
+            if not has_moves and board.is_check():
+                winner = "black" if board.turn else "white"
+                self._state_cache = (True, f"checkmate_{winner}_wins")
+            elif board.is_insufficient_material():
+                self._state_cache = (True, _DRAW_REASONS[chess.Termination.INSUFFICIENT_MATERIAL])
+            elif not has_moves:
+                self._state_cache = (True, _DRAW_REASONS[chess.Termination.STALEMATE])
+            elif board.is_seventyfive_moves():
+                self._state_cache = (True, _DRAW_REASONS[chess.Termination.SEVENTYFIVE_MOVES])
+            elif self.repetition_count() >= 5:
+                # Counted incrementally by Zobrist key instead of walking the move stack
+                self._state_cache = (True, _DRAW_REASONS[chess.Termination.FIVEFOLD_REPETITION])
+            else:
+                self._state_cache = (False, "game_active")
+        return self._state_cache
     
     def end_reason(self) -> str:
         """Return reason for game end."""
-        if not self.board.is_game_over():
-            return "game_active"
-        elif self.board.is_checkmate():
-            winner = "black" if self.board.turn else "white"
-            return f"checkmate_{winner}_wins"
-        elif self.board.is_stalemate():
-            return "stalemate_draw"
-        elif self.board.is_insufficient_material():
-            return "insufficient_material_draw"
-        elif self.board.is_seventyfive_moves():
-            return "75_move_rule_draw"
-        elif self.board.is_fivefold_repetition():
-            return "repetition_draw"
-        else:
-            return "draw"
+        return self.classify_state()[1]
     
-    def move_history(self) -> List[str]:
-        """Return list of all moves in UCI notation."""
-        return self._move_history.copy()
+    def move_history(self) -> Sequence[str]:
+        """Return all moves in UCI notation as an immutable tuple."""
+        return tuple(_decode_move(code).uci() for code in self._move_history)
+    
+    def move_count(self) -> int:
+        """Return the number of moves played."""
+        return len(self._move_history)
+    
+    def last_move(self) -> Optional[str]:
+        """Return the most recent move in UCI notation, or None."""
+        if not self._move_history:
+            return None
+        return _decode_move(self._move_history[-1]).uci()
     
     def move_history_san(self) -> List[str]:
         """Return move history in Standard Algebraic Notation (SAN)."""
-        temp_board = chess.Board()
-        san_moves = []
-        for uci_move in self._move_history:
-            move = chess.Move.from_uci(uci_move)
-            san_moves.append(temp_board.san(move))
-            temp_board.push(move)
-        return san_moves
+        return self._san_history.copy()
     
     def current_turn(self) -> str:
         """Return current player: 'white' or 'black'."""
@@ -121,15 +285,30 @@ class ChessGameManager:
     def reset_game(self) -> None:
         """Reset board to initial position."""
         self.board.reset()
-        self._move_history.clear()
+        del self._move_history[:]
+        self._rehash()
+        self._reset_records()
         self._game_metadata = {
             "start_time": None,
             "end_time": None,
             "result": None
         }
+        self.dirty = True
+    
+    def get_game_status_summary(self) -> Dict[str, Any]:
+        """Return the lightweight subset of the summary used for status polling."""
+        game_over, reason = self.classify_state()
+        return {
+            "fen": self.get_fen(),
+            "turn": self.current_turn(),
+            "move_count": len(self._move_history),
+            "game_over": game_over,
+            "end_reason": reason if game_over else None,
+        }
     
     def get_game_summary(self) -> Dict[str, Any]:
         """Return comprehensive game state summary."""
+        game_over, reason = self.classify_state()
         return {
             "fen": self.get_fen(),
             "turn": self.current_turn(),
@@ -137,33 +316,31 @@ class ChessGameManager:
             "moves_uci": self.move_history(),
             "moves_san": self.move_history_san(),
             "legal_moves": self.get_legal_moves(),
-            "game_over": self.is_gameover(),
-            "end_reason": self.end_reason() if self.is_gameover() else None,
+            "game_over": game_over,
+            "end_reason": reason if game_over else None,
             "in_check": self.board.is_check(),
             "metadata": self._game_metadata
         }
     
     def to_pgn(self) -> str:
         """Export game as PGN format."""
-        game = chess.pgn.Game()
+        game = self._pgn_game
         game.headers["Event"] = "ADK Chess Game"
-        game.headers["Result"] = self.end_reason() if self.is_gameover() else "*"
-        
-        node = game
-        temp_board = chess.Board()
-        
-        for uci_move in self._move_history:
-            move = chess.Move.from_uci(uci_move)
-            node = node.add_variation(move)
-            temp_board.push(move)
-        
+        game_over, reason = self.classify_state()
+        game.headers["Result"] = reason if game_over else "*"
         return str(game)
     
     def load_from_fen(self, fen: str) -> bool:
         """Load game state from FEN string."""
+        # Reject obviously malformed FENs before building a Board
+        if not isinstance(fen, str) or not _FEN_PLACEMENT_RE.match(fen):
+            return False
         try:
             self.board = chess.Board(fen)
-            self._move_history.clear()  # Clear history when loading from FEN
+            del self._move_history[:]  # Clear history when loading from FEN
+            self._rehash()
+            self._reset_records()
+            self.dirty = True
             return True
         except:
             return False
@@ -172,19 +349,30 @@ class ChessGameManager:
         """Serialize game manager state to JSON string for storage."""
         state = {
             "fen": self.get_fen(),
-            "move_history": self._move_history,
+            "move_history": self.move_history(),
             "metadata": self._game_metadata
         }
-        return json.dumps(state)
+        return _dumps(state)
+    
+    def checkpoint(self) -> Optional[str]:
+        """Serialize state only if it changed since the last checkpoint."""
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return self.serialize()
     
     @classmethod
     def deserialize(cls, state_json: str) -> 'ChessGameManager':
         """Deserialize game manager from JSON string."""
-        state = json.loads(state_json)
+        state = _loads(state_json)
         manager = cls()
         manager.load_from_fen(state["fen"])
-        manager._move_history = state.get("move_history", [])
+        manager._move_history = array('H', (
+            _encode_move(chess.Move.from_uci(uci)) for uci in state.get("move_history", [])
+        ))
+        manager._replay_records()
         manager._game_metadata = state.get("metadata", {})
+        manager.dirty = False
         return manager
 
 
@@ -199,7 +387,7 @@ def start_game(tool_context: ToolContext) -> str:
     - Clear move history
     - Update session state with fresh game manager
     """
-    print(f"🚀 ORCHESTRATOR CALLED: start_game()")
+    logger.debug("ORCHESTRATOR CALLED: start_game()")
     browser_id = tool_context.state.get("browser_session_id")
     
     if browser_id:
@@ -209,8 +397,9 @@ def start_game(tool_context: ToolContext) -> str:
     
     game_manager.reset_game()
     
-    # Store serialized game manager in session state
-    tool_context.state["chess_game_manager"] = game_manager.serialize()
+    # The live manager is kept per browser in ChessGameManager._instances,
+    # so session state only needs a lightweight reference to it
+    tool_context.state["chess_game_manager"] = {"browser_id": browser_id, "active": True}
     tool_context.state["game_active"] = True
     tool_context.state["planning_context"] = "game_started"
     
@@ -235,22 +424,22 @@ def play_turn(tool_context: ToolContext) -> str:
     
     game_manager = ChessGameManager.get_for_browser(browser_id)
     
-    if game_manager.is_gameover():
-        reason = game_manager.end_reason()
+    game_over, reason = game_manager.classify_state()
+    if game_over:
         tool_context.state["game_active"] = False
         tool_context.state["planning_context"] = "game_ended"
         return f"Game already ended: {reason}"
     
     current_player = game_manager.current_turn()
     current_fen = game_manager.get_fen()
-    legal_moves_count = len(game_manager.get_legal_moves())
+    legal_moves_count = game_manager.legal_move_count()
     
     # Update planning context for sub-agent coordination
     tool_context.state["planning_context"] = f"awaiting_{current_player}_move"
     tool_context.state["current_fen"] = current_fen
     tool_context.state["legal_moves_count"] = legal_moves_count
     
-    return f"Turn for {current_player}. Current FEN: {current_fen}. Legal moves: {legal_moves_count}. Move count: {len(game_manager.move_history())}"
+    return f"Turn for {current_player}. Current FEN: {current_fen}. Legal moves: {legal_moves_count}. Move count: {game_manager.move_count()}"
 
 
 def apply_move(tool_context: ToolContext, uci_move: str) -> str:
@@ -262,15 +451,18 @@ def apply_move(tool_context: ToolContext, uci_move: str) -> str:
     - Check for game end conditions
     - Update session state with new position
     """
-    print(f"♟️ ORCHESTRATOR CALLED: apply_move(uci_move='{uci_move}')")
+    logger.debug("ORCHESTRATOR CALLED: apply_move(uci_move=%r)", uci_move)
+    # Players reply with plain text, so tolerate stray whitespace around the move
+    uci_move = uci_move.strip()
     browser_id = tool_context.state.get("browser_session_id")
     if not browser_id:
         return "No browser session ID. Cannot access game."
     
     game_manager = ChessGameManager.get_for_browser(browser_id)
     
-    if game_manager.is_gameover():
-        return f"Game already ended: {game_manager.end_reason()}"
+    game_over, reason = game_manager.classify_state()
+    if game_over:
+        return f"Game already ended: {reason}"
     
     if not game_manager.is_legal_move(uci_move):
         legal_moves = game_manager.get_legal_moves()
@@ -285,15 +477,20 @@ def apply_move(tool_context: ToolContext, uci_move: str) -> str:
     tool_context.state["last_move"] = uci_move
     
     # Check game status
-    if game_manager.is_gameover():
-        reason = game_manager.end_reason()
+    new_fen = game_manager.get_fen()
+    game_over, reason = game_manager.classify_state()
+    if game_over:
         tool_context.state["game_active"] = False
         tool_context.state["planning_context"] = "game_ended"
-        return f"Move {uci_move} applied. Game ended: {reason}. Final FEN: {game_manager.get_fen()}"
+        # Persist the finished game once; checkpoint() skips the work if nothing changed
+        final_state = game_manager.checkpoint()
+        if final_state is not None:
+            tool_context.state["final_game_state"] = final_state
+        return f"Move {uci_move} applied. Game ended: {reason}. Final FEN: {new_fen}"
     else:
         next_player = game_manager.current_turn()
         tool_context.state["planning_context"] = f"move_applied_next_{next_player}"
-        return f"Move {uci_move} applied successfully. Next turn: {next_player}. FEN: {game_manager.get_fen()}"
+        return f"Move {uci_move} applied successfully. Next turn: {next_player}. FEN: {new_fen}"
 
 
 def get_game_status(tool_context: ToolContext) -> str:
@@ -304,13 +501,13 @@ def get_game_status(tool_context: ToolContext) -> str:
     - Include current position, turn, move history
     - Report game end status if applicable
     """
-    print(f"📊 ORCHESTRATOR CALLED: get_game_status()")
+    logger.debug("ORCHESTRATOR CALLED: get_game_status()")
     browser_id = tool_context.state.get("browser_session_id")
     if not browser_id:
         return "No browser session ID. Cannot access game."
     
     game_manager = ChessGameManager.get_for_browser(browser_id)
-    summary = game_manager.get_game_summary()
+    summary = game_manager.get_game_status_summary()
     
     return f"Game Status: FEN={summary['fen']}, Turn={summary['turn']}, Moves={summary['move_count']}, GameOver={summary['game_over']}, Reason={summary['end_reason']}"
 
@@ -332,4 +529,5 @@ def reset_game(tool_context: ToolContext) -> str:
     tool_context.state["game_active"] = True
     tool_context.state["planning_context"] = "game_reset"
     
-    return f"Game reset to initial position. FEN: {game_manager.get_fen()}. White to move."
\ No newline at end of file
+    new_fen = game_manager.get_fen()
+    return f"Game reset to initial position. FEN: {new_fen}. White to move."
\ No newline at end of file
@@ -19,6 +19,7 @@ import logging
 from dotenv import load_dotenv
 import warnings
 import agentops
+import httpx
 
 warnings.filterwarnings("ignore", message=".*\[EXPERIMENTAL\].*", category=UserWarning)
 
@@ -28,14 +29,18 @@ logging.basicConfig(level=log_level)
 
 # Suppress INFO logging
 logging.getLogger().setLevel(logging.WARNING)
-logging.getLogger("google").setLevel(logging.WARNING)
-logging.getLogger("google_genai").setLevel(logging.ERROR)
-logging.getLogger("google_adk").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("google.adk").setLevel(logging.WARNING)
-logging.getLogger("google.genai").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
+_LOG_LEVELS = (
+    ("google", logging.WARNING),
+    ("google_genai", logging.ERROR),
+    ("google_adk", logging.WARNING),
+    ("urllib3", logging.WARNING),
+    ("google.adk", logging.WARNING),
+    ("google.genai", logging.WARNING),
+    ("httpx", logging.WARNING),
+    ("httpcore", logging.WARNING),
+)
+for _name, _level in _LOG_LEVELS:
+    logging.getLogger(_name).setLevel(_level)
 
 from google.adk import Agent
 from google.adk.agents.remote_a2a_agent import RemoteA2aAgent
@@ -58,13 +63,25 @@ from chess_game_manager import (
 # Load environment variables
 load_dotenv()
 
+# Environment configuration, read once at import
+AGENTOPS_USE = os.getenv("AGENTOPS_USE", "false").lower() == "true"
+WHITE_PLAYER_URL = os.getenv("WHITE_PLAYER_URL", "http://localhost:8005")
+BLACK_PLAYER_URL = os.getenv("BLACK_PLAYER_URL", "http://localhost:8006")
+ORCHESTRATOR_MODEL = os.getenv("ORCHESTRATOR_MODEL", "gemini-2.5-flash")
+ORCHESTRATOR_THINKING_BUDGET = int(os.getenv("ORCHESTRATOR_THINKING_BUDGET", "4096"))
+ORCHESTRATOR_MAX_CALLS = int(os.getenv("ORCHESTRATOR_MAX_CALLS", "15"))
+# Seconds to wait for a player agent's reply (ADK's RemoteA2aAgent default)
+PLAYER_HTTP_TIMEOUT = float(os.getenv("PLAYER_HTTP_TIMEOUT", "600"))
+# Connecting should be near-instant; fail fast if a player container is down
+PLAYER_CONNECT_TIMEOUT = float(os.getenv("PLAYER_CONNECT_TIMEOUT", "5"))
+
 # Initialize AgentOps for observability (if enabled)
-if os.getenv("AGENTOPS_USE", "false").lower() == "true":
+if AGENTOPS_USE:
     agentops.init(
         api_key=os.getenv("AGENTOPS_API_KEY"),
         tags=["chess", "orchestrator", "adk", "a2a"]
     )
-    print("🔍 AgentOps observability enabled for orchestrator agent")
+    logger.info("AgentOps observability enabled for orchestrator agent")
 
 # Legacy function - now handled by ChessGameManager
 # Keeping for compatibility if needed
@@ -77,35 +94,39 @@ def make_move(fen: str, move_uci: str) -> str:
     return board.fen()
 
 # Configure remote player agents with environment variable support
-white_player_url = os.getenv("WHITE_PLAYER_URL", "http://localhost:8005")
-black_player_url = os.getenv("BLACK_PLAYER_URL", "http://localhost:8006")
-
-print(f"🔗 WHITE_PLAYER_URL: {white_player_url}")
-print(f"🔗 BLACK_PLAYER_URL: {black_player_url}")
+white_agent_card_url = f"{WHITE_PLAYER_URL}/.well-known/agent-card.json"
+black_agent_card_url = f"{BLACK_PLAYER_URL}/.well-known/agent-card.json"
+
+# One HTTP client for both players instead of one per RemoteA2aAgent, so keep-alive
+# connections to each player are pooled and reused across turns
+player_http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(PLAYER_HTTP_TIMEOUT, connect=PLAYER_CONNECT_TIMEOUT),
+    limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+)
 
 white_player_agent = RemoteA2aAgent(
     name="white_player",
-    agent_card=f"{white_player_url}/.well-known/agent-card.json",
-    description="White chess player agent that generates moves for white pieces"
+    agent_card=white_agent_card_url,
+    description="White chess player agent that generates moves for white pieces",
+    httpx_client=player_http_client
 )
 
 black_player_agent = RemoteA2aAgent(
     name="black_player",
-    agent_card=f"{black_player_url}/.well-known/agent-card.json",
-    description="Black chess player agent that generates moves for black pieces"
+    agent_card=black_agent_card_url,
+    description="Black chess player agent that generates moves for black pieces",
+    httpx_client=player_http_client
 )
 
-print(f"🔗 White agent card URL: {white_player_url}/.well-known/agent-card.json")
-print(f"🔗 Black agent card URL: {black_player_url}/.well-known/agent-card.json")
+logger.info("White agent card URL: %s", white_agent_card_url)
+logger.info("Black agent card URL: %s", black_agent_card_url)
 
 # Create AgentTool wrappers for direct A2A player agent communication
 white_agent_tool = AgentTool(agent=white_player_agent)
 black_agent_tool = AgentTool(agent=black_player_agent)
 
-print("🔧 AgentTools created for white and black players")
-
 root_agent = Agent(
-    model=os.getenv("ORCHESTRATOR_MODEL", "gemini-2.5-flash"),
+    model=ORCHESTRATOR_MODEL,
     name="chess_orchestrator",
     description="Chess game orchestrator with multistep planning that manages complete chess games",
     instruction="""You are a Chess Game Orchestrator that plays COMPLETE AUTOMATED GAMES between AI agents.
@@ -122,7 +143,8 @@ When user says "start game" or "begin game", you must:
 3. Report final game result
 
 AUTOMATED TURN SEQUENCE:
-1. Use 'get_game_status' to get current FEN and turn information
+1. Take the current FEN and next turn from the latest 'start_game' or 'apply_move' result
+   (only use 'get_game_status' if you do not have them)
 2. If white's turn: Use 'white_player' tool with FEN as input
 3. If black's turn: Use 'black_player' tool with FEN as input
 4. Use 'apply_move' with 'uci_move' parameter to execute the returned move
@@ -145,12 +167,12 @@ PLANNING APPROACH:
 
 DO NOT ask users for moves. DO NOT wait for input. Play complete games automatically.
 
-Example flow: 'start_game' → 'get_game_status' → 'white_player'(fen="...") → 'apply_move'(uci_move="e2e4") → 'black_player'(fen="...") → 'apply_move'(uci_move="e7e5") → repeat until game ends.""",
+Example flow: 'start_game' → 'white_player'(fen="...") → 'apply_move'(uci_move="e2e4") → 'black_player'(fen="...") → 'apply_move'(uci_move="e7e5") → repeat until game ends.""",
 
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
             include_thoughts=True,
-            thinking_budget=int(os.getenv("ORCHESTRATOR_THINKING_BUDGET", "4096"))
+            thinking_budget=ORCHESTRATOR_THINKING_BUDGET
         )
     ),
 
@@ -165,7 +187,7 @@ Example flow: 'start_game' → 'get_game_status' → 'white_player'(fen="...") 
     ],
     generate_content_config=types.GenerateContentConfig(
         automatic_function_calling=types.AutomaticFunctionCallingConfig(
-            maximum_remote_calls=int(os.getenv("ORCHESTRATOR_MAX_CALLS", "15"))
+            maximum_remote_calls=ORCHESTRATOR_MAX_CALLS
         ),
         safety_settings=[
             types.SafetySetting(  # avoid false alarm about rolling dice.
@@ -4,33 +4,20 @@ Simple Chess UI - Gradio interface for ADK Chess Orchestrator
 """
 
 import asyncio
-import threading
+import functools
 import time
 import uuid
 from typing import Optional
 import json
 import os
 
-import gradio as gr
 import chess
 import chess.svg
-from PIL import Image
-import io
 from dotenv import load_dotenv
 
 # Load environment variables from local .env file
 load_dotenv(".env")
 
-try:
-    import cairosvg
-    SVG_AVAILABLE = True
-except ImportError:
-    print("cairosvg not available - using fallback board display")
-    SVG_AVAILABLE = False
-
-from google.adk.runners import InMemoryRunner
-from google.genai import types
-from orchestrator_agent.agent import root_agent
 from chess_game_manager import ChessGameManager
 import logging
 import warnings
@@ -43,21 +30,26 @@ logging.basicConfig(level=log_level)
 
 # Suppress INFO logging
 logging.getLogger().setLevel(logging.WARNING)
-logging.getLogger("google").setLevel(logging.WARNING)
-logging.getLogger("google_genai").setLevel(logging.ERROR)
-logging.getLogger("google_adk").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("google.adk").setLevel(logging.WARNING)
-logging.getLogger("google.genai").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
+_LOG_LEVELS = (
+    ("google", logging.WARNING),
+    ("google_genai", logging.ERROR),
+    ("google_adk", logging.WARNING),
+    ("urllib3", logging.WARNING),
+    ("google.adk", logging.WARNING),
+    ("google.genai", logging.WARNING),
+    ("httpx", logging.WARNING),
+    ("httpcore", logging.WARNING),
+)
+for _name, _level in _LOG_LEVELS:
+    logging.getLogger(_name).setLevel(_level)
 
 # Constants
 DEFAULT_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
-BOARD_SIZE = 800
 APP_NAME = "simple_chess_ui"
 USER_ID = "ui_user"
 SESSION_ID = "chess_ui_session"
+# Shown if board rendering fails; scales with its container like the board itself
+PLACEHOLDER_SVG = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 8 8"><rect width="8" height="8" fill="lightgray"/></svg>'
 
 def create_default_browser_session():
     """Create minimal browser session data"""
@@ -69,20 +61,38 @@ def create_default_browser_session():
         }
     }
 
+@functools.lru_cache(maxsize=1)
+def _get_root_agent():
+    """Import the orchestrator agent (and its ADK/A2A stack) on first use"""
+    from orchestrator_agent.agent import root_agent
+    return root_agent
+
 class SimpleChessUI:
     """Simple chess UI manager"""
 
     def __init__(self):
-        # ADK setup
-        self.runner = InMemoryRunner(
-            app_name=APP_NAME,
-            agent=root_agent
-        )
+        # ADK runner is created on first use so rendering doesn't pay for the agent imports
+        self._runner = None
         self.session = None
         self.current_fen = DEFAULT_FEN
         self.last_move = None
         self.game_active = False
         self.last_update = time.time()
+        # Rendering is deterministic in (fen, last_move), so repeated ticks reuse the SVG
+        self._render_board = functools.lru_cache(maxsize=64)(self._render_board_uncached)
+        # Last rendered (fen, board), advanced by one move instead of reparsing the FEN
+        self._cached_position = (DEFAULT_FEN, chess.Board(DEFAULT_FEN))
+
+    @property
+    def runner(self):
+        """ADK runner for the orchestrator, created on first access"""
+        if self._runner is None:
+            from google.adk.runners import InMemoryRunner
+            self._runner = InMemoryRunner(
+                app_name=APP_NAME,
+                agent=_get_root_agent()
+            )
+        return self._runner
 
     async def initialize_session(self, browser_session=None):
         """Initialize ADK session with browser session ID"""
@@ -101,53 +111,60 @@ class SimpleChessUI:
             )
         return self.session
 
-    def svg_to_png(self, svg_string: str) -> Image.Image:
-        """Convert SVG chess board to PNG image"""
-        if SVG_AVAILABLE:
-            try:
-                png_data = cairosvg.svg2png(
-                    bytestring=svg_string.encode('utf-8'),
-                    output_width=BOARD_SIZE,
-                    output_height=BOARD_SIZE
-                )
-                image = Image.open(io.BytesIO(png_data))
-
-                # Force RGBA mode to preserve transparency
-                if image.mode != 'RGBA':
-                    image = image.convert('RGBA')
-
-                return image
-            except Exception as e:
-                print(f"SVG conversion error: {e}")
-
-        # Fallback: create simple placeholder
-        img = Image.new('RGB', (BOARD_SIZE, BOARD_SIZE), color='lightgray')
-        return img
-
-    def get_board_image_from_session(self, browser_session: dict) -> Image.Image:
-        """Generate board image from browser session data"""
+    def get_session_position(self, browser_session: dict, game_manager: ChessGameManager = None) -> list:
+        """Return [fen, last_move] for the game shown in this browser session"""
         if not browser_session or 'browser_id' not in browser_session:
-            return self.get_board_image()
+            return [self.current_fen, None]
 
         # Get game state from game manager
-        game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
-        current_fen = game_manager.get_fen()
+        if game_manager is None:
+            game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
+        return [game_manager.get_fen(), game_manager.last_move()]
+
+    def get_board_svg_from_session(self, browser_session: dict, position: list = None) -> str:
+        """Generate board SVG from browser session data"""
+        if position is None:
+            position = self.get_session_position(browser_session)
 
-        # Get last move for highlighting
-        move_history = game_manager.move_history()
-        last_move = move_history[-1] if move_history else None
+        # Remember what this browser is showing so timer ticks can skip unchanged boards
+        if browser_session is not None:
+            browser_session['rendered_position'] = position
 
-        return self.get_board_image(current_fen, last_move)
+        return self.get_board_svg(*position)
 
-    def get_board_image(self, fen: str = None, last_move: str = None) -> Image.Image:
-        """Generate chess board image from FEN with enhanced styling"""
+    def get_board_svg(self, fen: str = None, last_move: str = None) -> str:
+        """Generate chess board SVG from FEN with enhanced styling"""
         if fen is None:
             fen = self.current_fen
-
+        return self._render_board(fen, last_move)
+
+    def _board_for(self, fen: str, last_move: Optional[str]) -> chess.Board:
+        """Return a board for fen, pushing last_move onto the previous board when it leads there"""
+        cached_fen, board = self._cached_position
+        if fen != cached_fen:
+            previous = board
+            board = None
+            if last_move:
+                try:
+                    candidate = previous.copy(stack=False)
+                    move = chess.Move.from_uci(last_move)
+                    if candidate.is_legal(move):
+                        candidate.push(move)
+                        if candidate.fen() == fen:
+                            board = candidate
+                except ValueError:
+                    pass
+            if board is None:
+                # New game or skipped moves: fall back to a full parse
+                board = chess.Board(fen)
+            # Swapped in as one tuple so concurrent renders never see a mismatched pair
+            self._cached_position = (fen, board)
+        return board
+
+    def _render_board_uncached(self, fen: str, last_move: Optional[str]) -> str:
+        """Render the board for a position; wrapped in an LRU cache in __init__"""
         try:
-            board = chess.Board(fen)
-            square_size = BOARD_SIZE // 8
-            actual_board_size = square_size * 8
+            board = self._board_for(fen, last_move)
 
             fill = {}
             arrows = []
@@ -176,7 +193,8 @@ class SimpleChessUI:
                     fill = {}
                     arrows = []
 
-            svg_data = chess.svg.board(
+            # No size: the SVG keeps only its viewBox and the browser scales it to the column
+            return chess.svg.board(
                 board=board,
                 fill=fill,
                 arrows=arrows,
@@ -185,18 +203,16 @@ class SimpleChessUI:
                     'square light': '#8ec1ef',
                     'square dark': '#eeefe7',
                 },
-                size=actual_board_size,
                 lastmove=lastmove_obj
             )
-
-            return self.svg_to_png(svg_data)
         except Exception as e:
-            print(f"Error generating board image: {e}")
-            return Image.new('RGB', (BOARD_SIZE, BOARD_SIZE), color='lightgray')
+            print(f"Error generating board SVG: {e}")
+            return PLACEHOLDER_SVG
 
     async def send_begin_command(self, browser_session=None):
         """Send 'begin' command to orchestrator agent"""
         print("🎮 Sending 'begin' command to orchestrator...")
+        from google.genai import types
         try:
             await self.initialize_session(browser_session)
 
@@ -214,7 +230,8 @@ class SimpleChessUI:
                 if event.content and event.content.parts:
                     for part in event.content.parts:
                         if part.text:
-                            print(f"🎮 Orchestrator response: {part.text[:100]}...")
+                            # One event per model step; %.100s truncates without slicing unless enabled
+                            logger.debug("Orchestrator response: %.100s...", part.text)
 
             self.game_active = True
             print("🎮 Game started! Orchestrator will play automatically.")
@@ -224,7 +241,7 @@ class SimpleChessUI:
             print(error_msg)
             return error_msg
 
-    async def update_board_state(self, browser_session=None):
+    async def update_board_state(self, browser_session=None, game_manager: ChessGameManager = None):
         """Update board state from browser-scoped ChessGameManager"""
         try:
             if not browser_session or 'browser_id' not in browser_session:
@@ -232,17 +249,14 @@ class SimpleChessUI:
                 return
 
             # Get the browser-scoped game manager instance
-            game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
+            if game_manager is None:
+                game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
             new_fen = game_manager.get_fen()
 
             if new_fen != self.current_fen:
-                print(f"🔄 Board updated: {new_fen}")
+                logger.debug("Board updated: %s", new_fen)
                 # Get the last move from move history
-                move_history = game_manager.move_history()
-                if move_history:
-                    self.last_move = move_history[-1]
-                else:
-                    self.last_move = None
+                self.last_move = game_manager.last_move()
 
                 self.current_fen = new_fen
                 self.last_update = time.time()
@@ -253,9 +267,13 @@ class SimpleChessUI:
 # Global UI instance
 chess_ui = SimpleChessUI()
 
+# Strong references to orchestrator runs; the event loop only keeps weak ones
+_background_tasks = set()
+
 # Gradio Interface Functions
-def start_game(browser_session):
+async def start_game(browser_session):
     """Start button handler"""
+    import gradio as gr
     print("🟢 Start button pressed!")
 
     # Initialize browser session if needed
@@ -267,72 +285,76 @@ def start_game(browser_session):
     # Mark game as active in browser session
     browser_session['game_active'] = True
 
-    # Start orchestrator in background thread so it doesn't block the UI
-    def run_orchestrator():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(chess_ui.send_begin_command(browser_session))
-        except Exception as e:
-            print(f"Orchestrator error: {e}")
+    # Run orchestrator as a task on Gradio's event loop so it doesn't block the UI
+    def on_orchestrator_done(task):
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Orchestrator error: {task.exception()}")
             browser_session['game_active'] = False
-        finally:
-            loop.close()
 
-    # Start orchestrator in background
-    threading.Thread(target=run_orchestrator, daemon=True).start()
+    task = asyncio.create_task(chess_ui.send_begin_command(browser_session))
+    _background_tasks.add(task)
+    task.add_done_callback(on_orchestrator_done)
 
     # Return immediately with active button state
-    board_image = chess_ui.get_board_image_from_session(browser_session)
-    return browser_session, board_image, "Game Started! Orchestrator playing automatically...", gr.update(interactive=False, value="🔄 Game Running...")
+    board_svg = chess_ui.get_board_svg_from_session(browser_session)
+    return browser_session, board_svg, "Game Started! Orchestrator playing automatically...", gr.update(interactive=False, value="🔄 Game Running...")
 
-def update_board(browser_session):
+async def update_board(browser_session):
     """Periodic board update"""
+    import gradio as gr
     if not browser_session:
         browser_session = create_default_browser_session()
 
+    # Look the game manager up once per tick and share it with the helpers below
+    game_manager = None
+    if browser_session.get('browser_id'):
+        game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
+
     # Update board state from browser session
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(chess_ui.update_board_state(browser_session))
-    finally:
-        loop.close()
+    await chess_ui.update_board_state(browser_session, game_manager)
 
     # Check if game ended
-    if browser_session.get('browser_id'):
-        game_manager = ChessGameManager.get_for_browser(browser_session['browser_id'])
+    if game_manager is not None:
         if game_manager.is_gameover():
             browser_session['game_active'] = False
         elif chess_ui.game_active and 'game_active' not in browser_session:
             # If orchestrator is active but session doesn't reflect it, set it
             browser_session['game_active'] = True
 
-    # Get board image from session
-    board_image = chess_ui.get_board_image_from_session(browser_session)
-
-    # Return current board image and status
-    status = f"FEN: {chess_ui.current_fen}"
-    if chess_ui.last_move:
-        status += f" | Last move: {chess_ui.last_move}"
-    if chess_ui.game_active:
-        status += f" | Updated: {time.time() - chess_ui.last_update:.1f}s ago"
-
     # Return button state based on game activity - check both session and global state
     game_active = browser_session.get('game_active', False) or chess_ui.game_active
     if game_active:
         button_update = gr.update(interactive=False, value="🔄 Game Running...")
     else:
         button_update = gr.update(interactive=True, value="🟢 Start Game")
+
+    # Skip rendering and re-sending the SVG when the board hasn't changed
+    position = chess_ui.get_session_position(browser_session, game_manager)
+    if browser_session.get('rendered_position') == position:
+        if not game_active:
+            # Idle and unchanged: nothing to redraw
+            return browser_session, gr.skip(), gr.skip(), button_update
+        board_svg = gr.skip()
+    else:
+        board_svg = chess_ui.get_board_svg_from_session(browser_session, position)
+
+    # Return current board SVG and status
+    status = f"FEN: {chess_ui.current_fen}"
+    if chess_ui.last_move:
+        status += f" | Last move: {chess_ui.last_move}"
+    if chess_ui.game_active:
+        status += f" | Updated: {time.time() - chess_ui.last_update:.1f}s ago"
     
-    return browser_session, board_image, status, button_update
+    return browser_session, board_svg, status, button_update
 
 def get_initial_display(browser_session):
     """Get initial board display"""
+    import gradio as gr
     if not browser_session:
         browser_session = create_default_browser_session()
 
-    board_image = chess_ui.get_board_image_from_session(browser_session)
+    board_svg = chess_ui.get_board_svg_from_session(browser_session)
     
     # Check if game is active to set correct button state
     game_active = browser_session.get('game_active', False)
@@ -341,7 +363,7 @@ def get_initial_display(browser_session):
     else:
         button_update = gr.update(interactive=True, value="🟢 Start Game")
     
-    return browser_session, board_image, f"Ready to start | FEN: {chess_ui.current_fen}", button_update
+    return browser_session, board_svg, f"Ready to start | FEN: {chess_ui.current_fen}", button_update
 
 def toggle_theme_and_save(session_data):
     """Toggle theme and save to session"""
@@ -360,6 +382,7 @@ def toggle_theme_and_save(session_data):
 # Create Gradio Interface
 def create_interface():
     """Create the enhanced chess interface"""
+    import gradio as gr
 
     with gr.Blocks(theme=gr.themes.Soft(), title="Enhanced Chess UI") as demo:
 
@@ -378,15 +401,13 @@ def create_interface():
             with gr.Column(scale=4):
                 gr.Markdown("### Chess Board")
 
-                # Display board as image with proper container sizing
-                initial_board = chess_ui.get_board_image(last_move=chess_ui.last_move)
+                # Send the SVG itself; the browser renders it natively at any size
+                initial_board = chess_ui.get_board_svg(last_move=chess_ui.last_move)
 
-                board_image = gr.Image(
+                board_html = gr.HTML(
                     value=initial_board,
                     label="Chess Board",
-                    show_label=False,
-                    container=True,
-                    width="100%"
+                    show_label=False
                 )
 
                 # Start Button
@@ -416,7 +437,7 @@ def create_interface():
         start_btn.click(
             fn=start_game,
             inputs=[browser_session],
-            outputs=[browser_session, board_image, status_display, start_btn]
+            outputs=[browser_session, board_html, status_display, start_btn]
         )
 
         # Initialize theme on load
@@ -454,7 +475,7 @@ def create_interface():
         ).then(
             fn=get_initial_display,
             inputs=[browser_session],
-            outputs=[browser_session, board_image, status_display, start_btn]
+            outputs=[browser_session, board_html, status_display, start_btn]
         )
 
         # Theme toggle with session save
@@ -497,7 +518,7 @@ def create_interface():
         timer.tick(
             fn=update_board,
             inputs=[browser_session],
-            outputs=[browser_session, board_image, status_display, start_btn]
+            outputs=[browser_session, board_html, status_display, start_btn]
         )
 
     return demo
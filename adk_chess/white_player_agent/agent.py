@@ -22,7 +22,6 @@ import agentops
 from google.adk import Agent
 #from google.adk.tools.tool_context import ToolContext
 from google.genai import types
-from pydantic import BaseModel, Field
 
 #from google.adk.agents import LlmAgent
 from google.adk.tools import MCPToolset
@@ -49,33 +48,42 @@ logging.basicConfig(level=log_level)
 
 # Suppress INFO logging
 logging.getLogger().setLevel(logging.WARNING)
-logging.getLogger("google").setLevel(logging.WARNING)
-logging.getLogger("google_genai").setLevel(logging.ERROR)
-logging.getLogger("google_adk").setLevel(logging.ERROR)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("google_adk.google.adk.tools.base_authenticated_tool").setLevel(logging.ERROR)
-logging.getLogger("google_adk.google.adk.models.google_llm").setLevel(logging.ERROR)
-logging.getLogger("google.genai").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
+_LOG_LEVELS = (
+    ("google", logging.WARNING),
+    ("google_genai", logging.ERROR),
+    ("google_adk", logging.ERROR),
+    ("urllib3", logging.WARNING),
+    ("google_adk.google.adk.tools.base_authenticated_tool", logging.ERROR),
+    ("google_adk.google.adk.models.google_llm", logging.ERROR),
+    ("google.genai", logging.WARNING),
+    ("httpx", logging.WARNING),
+    ("httpcore", logging.WARNING),
+)
+for _name, _level in _LOG_LEVELS:
+    logging.getLogger(_name).setLevel(_level)
+
+class CachedMCPToolset(MCPToolset):
+    """MCPToolset that lists the server's tools once instead of before every model call."""
+
+    _cached_tools = None
+
+    async def get_tools(self, readonly_context=None):
+        # Tools open their own session per call, so the listing stays valid across reconnects
+        if self._cached_tools is None:
+            self._cached_tools = await super().get_tools(readonly_context)
+        return self._cached_tools
 
 # Configure MCP toolset for chess
-mcp_toolset = MCPToolset(
+mcp_toolset = CachedMCPToolset(
     connection_params=StreamableHTTPConnectionParams(
         url=os.getenv("MCP_SERVER_URL", "http://localhost:8010/mcp")
     ),
-    tool_filter=["validate_fen", "get_stockfish_move", "validate_move", "get_game_status", "get_legal_moves"]
+    tool_filter=["best_move", "validate_fen", "get_stockfish_move", "validate_move", "get_game_status", "get_legal_moves"]
 )
 
 # Store reference for cleanup
 mcp_toolset._cleanup_method = mcp_toolset.close
 
-# Define structured output schema for chess moves
-class ChessMoveOutput(BaseModel):
-    move: str = Field(description="UCI chess move notation like 'e2e4'",
-                     pattern=r'^[a-h][1-8][a-h][1-8][qrbn]?$')
-
-
 root_agent = Agent(
     model=os.getenv("WHITE_PLAYER_MODEL", "gemini-2.5-flash"),
     name="white_chess_player_agent",
@@ -83,16 +91,16 @@ root_agent = Agent(
     instruction="""You generate chess moves for WHITE pieces only.
 
 Process:
-1. Use validate_fen to check if the provided FEN is valid
-2. If FEN is invalid, use set_model_response tool with {"move": "Invalid FEN"}
-3. If FEN is valid, use get_stockfish_move with the FEN to generate a UCI move
-4. Use validate_move to verify the generated move is valid
-5. Use set_model_response tool to return the final JSON: {"move": "e2e4"}
-
-CRITICAL: Always use set_model_response as your final step with proper JSON format.
-Example: set_model_response({"move": "e2e4"})""",
+1. Call best_move once with the provided FEN; it validates the FEN, runs Stockfish and checks the move
+2. If best_move returns no move_uci because the FEN is invalid, reply with exactly: Invalid FEN
+3. Otherwise reply with its move_uci as-is; do not call validate_fen, get_stockfish_move or validate_move
+   separately. Only if best_move failed for another reason and you pick a move yourself,
+   verify it with validate_move first
+
+CRITICAL: Your final reply is the bare UCI move and nothing else - no JSON, quotes or explanation.
+Example reply: e2e4
+The orchestrator checks the move is legal before applying it and asks again if it is not.""",
     tools=[mcp_toolset],
-    output_schema=ChessMoveOutput,
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
             include_thoughts=True,
@@ -4,9 +4,14 @@ Chess MCP Server with Stockfish integration.
 Provides chess tools via MCP protocol for move validation, execution, 
 and engine analysis using Stockfish.
 """
+import asyncio
+import functools
 import os
+import re
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 import chess
 import chess.engine
@@ -21,16 +26,184 @@ load_dotenv("./.env")
 STOCKFISH_PATH = os.getenv("STOCKFISH_PATH", "/usr/local/bin/stockfish")
 MCP_SERVER_PORT = int(os.getenv("MCP_SERVER_PORT", "5000"))
 MCP_SERVER_HOST = os.getenv("MCP_SERVER_HOST", "0.0.0.0")
+# Keep agent connections open between tool calls instead of uvicorn's 5s default
+MCP_KEEP_ALIVE = int(os.getenv("MCP_KEEP_ALIVE", "75"))
+MCP_LIMIT_CONCURRENCY = int(os.getenv("MCP_LIMIT_CONCURRENCY", "256"))
+# Default search time per Stockfish move, in seconds
+STOCKFISH_TIME_LIMIT = float(os.getenv("STOCKFISH_TIME_LIMIT", "2.0"))
+# Stockfish processes shared by concurrent requests (each search is single-threaded)
+ENGINE_POOL_SIZE = int(os.getenv("ENGINE_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+# Seconds between Stockfish re-probes from the health check
+HEALTH_ENGINE_TTL = float(os.getenv("HEALTH_ENGINE_TTL", "30"))
+# Positions whose Stockfish move is remembered (openings and transpositions repeat across games)
+STOCKFISH_CACHE_SIZE = int(os.getenv("STOCKFISH_CACHE_SIZE", "100000"))
+HEALTH_CHECK_CACHE_TTL = 1.0
+
+# Starting-position legal moves, computed once: every game asks for them
+_STARTING_LEGAL_UCI = tuple(move.uci() for move in chess.Board().legal_moves)
+
+# Pool of idle Stockfish processes, started on demand up to ENGINE_POOL_SIZE
+# (a SimpleEngine is not thread-safe, so each one is used by a single caller at a time)
+_idle_engines: List[chess.engine.SimpleEngine] = []
+_engines_started = 0
+# Signalled whenever an engine is released or discarded, so waiters re-check the pool
+_engines_cond = threading.Condition()
+
+def _acquire_engine(timeout: Optional[float] = None) -> chess.engine.SimpleEngine:
+    """Take an idle engine from the pool, starting a new one if the pool is not full yet.
+
+    Waits up to timeout seconds (forever if None) for a busy engine; raises TimeoutError after that.
+    """
+    global _engines_started
+    with _engines_cond:
+        if not _engines_cond.wait_for(lambda: _idle_engines or _engines_started < ENGINE_POOL_SIZE, timeout):
+            raise TimeoutError("all Stockfish engines are busy")
+        if _idle_engines:
+            return _idle_engines.pop()
+        _engines_started += 1
+    try:
+        return chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+    except Exception:
+        with _engines_cond:
+            _engines_started -= 1
+            _engines_cond.notify()
+        raise
+
+def _release_engine(engine: chess.engine.SimpleEngine) -> None:
+    """Return an engine to the pool after use."""
+    with _engines_cond:
+        _idle_engines.append(engine)
+        _engines_cond.notify()
+
+def _discard_engine(engine: chess.engine.SimpleEngine) -> None:
+    """Close a broken engine so a fresh one is started in its place."""
+    global _engines_started
+    try:
+        engine.quit()
+    except Exception:
+        pass
+    with _engines_cond:
+        _engines_started -= 1
+        # Wake a caller waiting for a busy engine; it can start the replacement
+        _engines_cond.notify()
+
+def _shutdown_engine() -> None:
+    """Quit every idle pooled engine.
+
+    Called when the server stops rather than from atexit: SimpleEngine runs each engine on a
+    non-daemon thread, which Python joins before atexit handlers run, so exit would hang.
+    """
+    with _engines_cond:
+        engines = _idle_engines[:]
+        _idle_engines.clear()
+    for engine in engines:
+        _discard_engine(engine)
+
+# Last full health check result, reused for HEALTH_CHECK_CACHE_TTL seconds so
+# back-to-back checks (including failing ones that try to start Stockfish) run once
+_health_check_result = None
+_health_check_time = 0.0
+
+# Last engine id seen by the health check and when it was read
+_engine_info = None
+_engine_info_checked = 0.0
+
+def _cached_engine_info() -> str:
+    """Engine id string, refreshed with a ping to Stockfish at most once per HEALTH_ENGINE_TTL seconds."""
+    global _engine_info, _engine_info_checked
+    now = time.monotonic()
+    if _engine_info is None or now - _engine_info_checked >= HEALTH_ENGINE_TTL:
+        try:
+            # Never wait behind searches: a full pool of busy engines is itself a healthy engine
+            engine = _acquire_engine(timeout=0)
+        except TimeoutError:
+            return _engine_info or "busy (all engines searching)"
+        try:
+            # engine.id is cached from the UCI handshake; ping checks the process still answers
+            engine.ping()
+        except Exception:
+            _discard_engine(engine)
+            raise
+        _engine_info = str(engine.id)[:100]  # Limit length
+        _release_engine(engine)
+        _engine_info_checked = now
+    return _engine_info
+
+# Cheap shape check for the piece-placement field; chess.Board still does full validation
+_FEN_PLACEMENT_RE = re.compile(r'^\s*(?:[pnbrqkPNBRQK1-8~]+/){7}[pnbrqkPNBRQK1-8~]+(?:\s|$)')
+
+@functools.lru_cache(maxsize=256)
+def _board_from_fen(fen: str) -> chess.Board:
+    """Parsed board for a FEN, cached. Shared between callers: copy() before mutating."""
+    if not _FEN_PLACEMENT_RE.match(fen):
+        # Reject obvious garbage before python-chess's parser (errors are not cached)
+        raise ValueError(f"invalid piece placement in fen: {fen!r}")
+    return chess.Board(fen)
+
+@functools.lru_cache(maxsize=1024)
+def _legal_moves_uci(fen: str) -> Tuple[str, ...]:
+    """Legal moves for a position in UCI notation, cached per FEN."""
+    board = _board_from_fen(fen)
+    return tuple(move.uci() for move in board.legal_moves)
+
+@functools.lru_cache(maxsize=1024)
+def _game_status(fen: str) -> Tuple[bool, Optional[bool], Optional[str], bool, int, str]:
+    """(is_game_over, winner, termination, is_check, legal_moves_count, current_turn), cached per FEN."""
+    board = _board_from_fen(fen)
+    outcome = board.outcome()
+    return (
+        outcome is not None,
+        # True = white, False = black, None = draw or game in progress
+        outcome.winner if outcome else None,
+        outcome.termination.name if outcome else None,
+        board.is_check(),
+        len(_legal_moves_uci(fen)),
+        "white" if board.turn else "black"
+    )
+
+@functools.lru_cache(maxsize=STOCKFISH_CACHE_SIZE)
+def _stockfish_move_uci(search_fen: str, time_limit: float) -> Optional[str]:
+    """Stockfish's move for a position, cached per FEN (fullmove number normalised) and time limit."""
+    board = chess.Board(search_fen)
+    engine = _acquire_engine()
+    try:
+        result = engine.play(board, chess.engine.Limit(time=time_limit))
+    except Exception:
+        # Engine died or misbehaved; a new one is started on demand
+        _discard_engine(engine)
+        raise
+    _release_engine(engine)
+    return result.move.uci() if result.move else None
+
+def clear_caches() -> None:
+    """Drop every per-FEN cache (parsed boards, legal moves, game status, Stockfish moves)."""
+    _board_from_fen.cache_clear()
+    _legal_moves_uci.cache_clear()
+    _game_status.cache_clear()
+    _stockfish_move_uci.cache_clear()
 
 # Core business logic functions (not decorated, for testing)
+def _parse_legal_move(board: chess.Board, move_uci: str) -> Optional[chess.Move]:
+    """Parse a UCI move and check it against the position in one step; None if illegal.
+
+    Raises ValueError for malformed UCI strings.
+    """
+    try:
+        move = board.parse_uci(move_uci)
+    except chess.IllegalMoveError:
+        return None
+    # parse_uci accepts the null move "0000", which is never a legal move, and rewrites
+    # king-takes-rook (e1h1) into castling; only the canonical spelling is accepted
+    if not move or move.uci() != move_uci:
+        return None
+    return move
+
 def validate_move_logic(fen: str, move_uci: str) -> Dict[str, Any]:
     """Check if a move is valid given a board position."""
     try:
-        board = chess.Board(fen)
-        move = chess.Move.from_uci(move_uci)
-        is_legal = move in board.legal_moves
+        board = _board_from_fen(fen)
         return {
-            "valid": is_legal,
+            "valid": _parse_legal_move(board, move_uci) is not None,
             "error": None
         }
     except Exception as e:
@@ -39,45 +212,126 @@ def validate_move_logic(fen: str, move_uci: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def make_move_logic(fen: str, move_uci: str) -> Dict[str, Any]:
-    """Execute a move on the board and return new position."""
+def try_move_logic(fen: str, move_uci: str) -> Dict[str, Any]:
+    """Validate a move and, if legal, apply it, parsing the position only once."""
     try:
-        board = chess.Board(fen)
-        move = chess.Move.from_uci(move_uci)
+        board = _board_from_fen(fen)
+        move = _parse_legal_move(board, move_uci)
         
-        if move in board.legal_moves:
+        if move is not None:
+            board = board.copy()
             board.push(move)
+            # Status of the resulting position, so callers don't need a get_game_status round trip
+            outcome = board.outcome()
             return {
-                "success": True,
+                "valid": True,
                 "new_fen": board.fen(),
+                "is_game_over": outcome is not None,
+                "winner": outcome.winner if outcome else None,
+                "current_turn": "white" if board.turn else "black",
                 "error": None
             }
         else:
+            # Position is unchanged; report its (cached) status, which may already be game over
+            is_game_over, winner, _, _, _, current_turn = _game_status(fen)
             return {
-                "success": False,
+                "valid": False,
                 "new_fen": fen,
+                "is_game_over": is_game_over,
+                "winner": winner,
+                "current_turn": current_turn,
                 "error": "Invalid move"
             }
     except Exception as e:
         return {
-            "success": False,
+            "valid": False,
             "new_fen": fen,
+            "is_game_over": False,
+            "winner": None,
+            "current_turn": "unknown",
             "error": str(e)
         }
 
-def get_stockfish_move_logic(fen: str, time_limit: float = 2.0) -> Dict[str, Any]:
-    """Get best move from Stockfish engine."""
+def make_move_logic(fen: str, move_uci: str) -> Dict[str, Any]:
+    """Execute a move on the board and return new position."""
+    result = try_move_logic(fen, move_uci)
+    return {
+        "success": result["valid"],
+        "new_fen": result["new_fen"],
+        "is_game_over": result["is_game_over"],
+        "winner": result["winner"],
+        "current_turn": result["current_turn"],
+        "error": result["error"]
+    }
+
+def apply_move_sequence_logic(fen: str, moves: List[str]) -> Dict[str, Any]:
+    """Apply a sequence of UCI moves to one board, stopping at the first illegal move."""
     try:
-        board = chess.Board(fen)
+        board = _board_from_fen(fen).copy()
+        statuses = []
         
-        with chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH) as engine:
-            result = engine.play(board, chess.engine.Limit(time=time_limit))
-            
-            return {
-                "success": True,
-                "move_uci": result.move.uci() if result.move else None,
-                "error": None
-            }
+        for index, move_uci in enumerate(moves):
+            try:
+                move = _parse_legal_move(board, move_uci)
+            except ValueError:
+                # Malformed UCI: report it like an illegal move, keeping the moves already applied
+                move = None
+            if move is None:
+                # Status of the position reached, which may already be a finished game
+                outcome = board.outcome()
+                return {
+                    "success": False,
+                    "final_fen": board.fen(),
+                    "applied": index,
+                    "statuses": statuses,
+                    "is_game_over": outcome is not None,
+                    "winner": outcome.winner if outcome else None,
+                    "termination": outcome.termination.name if outcome else None,
+                    "error": f"Invalid move {move_uci} at index {index}"
+                }
+            board.push(move)
+            statuses.append({
+                "move_uci": move_uci,
+                "fen": board.fen(),
+                "is_check": board.is_check(),
+                "is_game_over": board.is_game_over()
+            })
+        
+        outcome = board.outcome()
+        return {
+            "success": True,
+            "final_fen": board.fen(),
+            "applied": len(moves),
+            "statuses": statuses,
+            "is_game_over": outcome is not None,
+            "winner": outcome.winner if outcome else None,
+            "termination": outcome.termination.name if outcome else None,
+            "error": None
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "final_fen": fen,
+            "applied": 0,
+            "statuses": [],
+            "is_game_over": False,
+            "winner": None,
+            "termination": None,
+            "error": str(e)
+        }
+
+def get_stockfish_move_logic(fen: str, time_limit: float = STOCKFISH_TIME_LIMIT) -> Dict[str, Any]:
+    """Get best move from Stockfish engine."""
+    try:
+        # The halfmove clock is kept (it drives the 50-move rule the engine plays around), but
+        # the fullmove number is fixed at 1 so transpositions at any move number hit the cache
+        board = _board_from_fen(fen)
+        search_fen = f"{board.epd()} {board.halfmove_clock} 1"
+        return {
+            "success": True,
+            "move_uci": _stockfish_move_uci(search_fen, float(time_limit)),
+            "error": None
+        }
     except Exception as e:
         return {
             "success": False,
@@ -85,19 +339,44 @@ def get_stockfish_move_logic(fen: str, time_limit: float = 2.0) -> Dict[str, Any
             "error": str(e)
         }
 
+def best_move_logic(fen: str, time_limit: float = STOCKFISH_TIME_LIMIT) -> Dict[str, Any]:
+    """Validate the FEN, ask Stockfish for a move and check it, all in one call."""
+    fen_result = validate_fen_logic(fen)
+    if not fen_result["valid"]:
+        return {
+            "move_uci": None,
+            "valid": False,
+            "error": f"Invalid FEN: {fen_result['error']}"
+        }
+    
+    engine_result = get_stockfish_move_logic(fen, time_limit)
+    if not engine_result["success"] or engine_result["move_uci"] is None:
+        return {
+            "move_uci": None,
+            "valid": False,
+            "error": engine_result["error"] or "Stockfish found no move (game is over)"
+        }
+    
+    move_result = validate_move_logic(fen, engine_result["move_uci"])
+    return {
+        "move_uci": engine_result["move_uci"],
+        "valid": move_result["valid"],
+        "error": move_result["error"]
+    }
+
 def get_game_status_logic(fen: str) -> Dict[str, Any]:
     """Check game status including checkmate, stalemate, and draw conditions."""
     try:
-        board = chess.Board(fen)
-        outcome = board.outcome()
+        # Built fresh from the cached tuple so callers can't alter the cached result
+        is_game_over, winner, termination, is_check, legal_moves_count, current_turn = _game_status(fen)
         
         return {
-            "is_game_over": outcome is not None,
-            "winner": str(outcome.winner) if outcome and outcome.winner else None,
-            "termination": str(outcome.termination) if outcome else None,
-            "is_check": board.is_check(),
-            "legal_moves_count": len(list(board.legal_moves)),
-            "current_turn": "white" if board.turn else "black",
+            "is_game_over": is_game_over,
+            "winner": winner,
+            "termination": termination,
+            "is_check": is_check,
+            "legal_moves_count": legal_moves_count,
+            "current_turn": current_turn,
             "error": None
         }
     except Exception as e:
@@ -114,7 +393,14 @@ def get_game_status_logic(fen: str) -> Dict[str, Any]:
 def validate_fen_logic(fen: str) -> Dict[str, Any]:
     """Check if a FEN string is syntactically valid and represents a legal chess position."""
     try:
-        board = chess.Board(fen)
+        status = _board_from_fen(fen).status()
+        if status != chess.STATUS_VALID:
+            # Parses, but breaks a position rule (missing kings, pawns on the back rank, ...)
+            problems = ", ".join(flag.name.lower() for flag in chess.Status if flag and flag in status)
+            return {
+                "valid": False,
+                "error": f"illegal position: {problems}"
+            }
         return {
             "valid": True,
             "error": None
@@ -128,8 +414,11 @@ def validate_fen_logic(fen: str) -> Dict[str, Any]:
 def get_legal_moves_logic(fen: str) -> Dict[str, Any]:
     """Get all legal moves for a position in UCI notation."""
     try:
-        board = chess.Board(fen)
-        legal_moves_uci = [move.uci() for move in board.legal_moves]
+        if fen == chess.STARTING_FEN:
+            # Fast path that never gets evicted from the LRU cache
+            legal_moves_uci = list(_STARTING_LEGAL_UCI)
+        else:
+            legal_moves_uci = list(_legal_moves_uci(fen))
         
         return {
             "success": True,
@@ -145,22 +434,27 @@ def get_legal_moves_logic(fen: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def health_check_logic() -> Dict[str, Any]:
+def health_check_logic(use_cache: bool = True) -> Dict[str, Any]:
     """Check server health and chess engine availability."""
+    global _health_check_result, _health_check_time
+    now = time.monotonic()
+    if use_cache and _health_check_result is not None and now - _health_check_time < HEALTH_CHECK_CACHE_TTL:
+        return dict(_health_check_result)
+    _health_check_result = _run_health_check()
+    _health_check_time = now
+    return dict(_health_check_result)
+
+def _run_health_check() -> Dict[str, Any]:
     try:
-        # Test basic chess functionality
-        board = chess.Board()
-        legal_moves = len(list(board.legal_moves))
-        
-        # Test Stockfish availability
-        with chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH) as engine:
-            engine_info = str(engine.id)
+        # Test Stockfish availability (cached between probes)
+        engine_info = _cached_engine_info()
         
         return {
             "status": "healthy",
             "chess_engine": "available",
-            "engine_info": engine_info[:100],  # Limit length
-            "legal_moves_test": legal_moves == 20,  # Standard starting position
+            "engine_info": engine_info,
+            "legal_moves_test": chess.Board().legal_moves.count() == 20,  # Standard starting position
+            "stockfish_cache": _stockfish_move_uci.cache_info()._asdict(),
             "stockfish_path": STOCKFISH_PATH,
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -178,18 +472,34 @@ mcp = FastMCP("chess-server")
 
 @mcp.tool()
 def validate_move(fen: str, move_uci: str) -> Dict[str, Any]:
-    """Check if a move is valid given a board position."""
+    """Check if a move is valid given a board position. Move generation should use best_move instead."""
     return validate_move_logic(fen, move_uci)
 
 @mcp.tool()
 def make_move(fen: str, move_uci: str) -> Dict[str, Any]:
-    """Execute a move on the board and return new position."""
+    """Execute a move on the board and return new position and game status."""
     return make_move_logic(fen, move_uci)
 
 @mcp.tool()
-def get_stockfish_move(fen: str, time_limit: float = 2.0) -> Dict[str, Any]:
-    """Get best move from Stockfish engine."""
-    return get_stockfish_move_logic(fen, time_limit)
+def try_move(fen: str, move_uci: str) -> Dict[str, Any]:
+    """Validate a move and, if legal, apply it; returns validity, the resulting FEN and game status."""
+    return try_move_logic(fen, move_uci)
+
+@mcp.tool()
+def apply_move_sequence(fen: str, moves: List[str]) -> Dict[str, Any]:
+    """Apply several UCI moves in order from a position; returns per-move status and the final FEN."""
+    return apply_move_sequence_logic(fen, moves)
+
+@mcp.tool()
+async def best_move(fen: str, time_limit: float = STOCKFISH_TIME_LIMIT) -> Dict[str, Any]:
+    """Preferred: validate the position and return Stockfish's checked move in a single call."""
+    return await asyncio.to_thread(best_move_logic, fen, time_limit)
+
+@mcp.tool()
+async def get_stockfish_move(fen: str, time_limit: float = STOCKFISH_TIME_LIMIT) -> Dict[str, Any]:
+    """Get best move from Stockfish engine. Prefer best_move, which also validates the FEN and move."""
+    # Run off the event loop so searches on different pooled engines overlap
+    return await asyncio.to_thread(get_stockfish_move_logic, fen, time_limit)
 
 @mcp.tool()
 def get_game_status(fen: str) -> Dict[str, Any]:
@@ -198,7 +508,7 @@ def get_game_status(fen: str) -> Dict[str, Any]:
 
 @mcp.tool()
 def validate_fen(fen: str) -> Dict[str, Any]:
-    """Check if a FEN string is syntactically valid and represents a legal chess position."""
+    """Check if a FEN string is syntactically valid and represents a legal chess position. Move generation should use best_move instead."""
     return validate_fen_logic(fen)
 
 @mcp.tool()
@@ -211,13 +521,33 @@ def health_check() -> Dict[str, Any]:
     """Check server health and chess engine availability."""
     return health_check_logic()
 
+# Latest health check result, refreshed in the background so /health never waits on Stockfish
+_health_cache: Dict[str, Any] = {}
+_health_probe_task = None
+
+async def _periodic_health_probe() -> None:
+    """Re-run the health check every HEALTH_ENGINE_TTL seconds."""
+    global _health_cache
+    while True:
+        _health_cache = await asyncio.to_thread(health_check_logic, use_cache=False)
+        await asyncio.sleep(HEALTH_ENGINE_TTL)
+
 # Health check route for deployment platforms like sliplane.io
 @mcp.custom_route("/health", methods=["GET"])
 async def health_endpoint(request: Request) -> JSONResponse:
     """HTTP health check endpoint for deployment platforms."""
-    health_data = health_check_logic()
+    global _health_probe_task
+    if _health_probe_task is None:
+        # Started on the first probe, once the server's event loop is running
+        _health_probe_task = asyncio.create_task(_periodic_health_probe())
     
-    # Return 200 if healthy, 503 if unhealthy
+    health_data = _health_cache or {
+        "status": "starting",
+        "chess_engine": "unknown",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    
+    # Not ready until Stockfish has been checked; failures during start_period don't count
     status_code = 200 if health_data["status"] == "healthy" else 503
     
     return JSONResponse(
@@ -232,19 +562,34 @@ async def health_endpoint(request: Request) -> JSONResponse:
 
 def start_chess_mcp_server():
     """Start the chess MCP server."""
+    global _health_cache
     print(f"Starting chess MCP server at {datetime.now()}")
     print(f"Server: {MCP_SERVER_HOST}:{MCP_SERVER_PORT}")
     print(f"Stockfish path: {STOCKFISH_PATH}")
     
     # Test Stockfish availability on startup
     health = health_check_logic()
+    # Serve this result from /health until the background probe takes over
+    _health_cache = health
     if health["status"] == "healthy":
         print("✅ Stockfish engine is available")
     else:
         print(f"❌ Stockfish engine test failed: {health.get('error')}")
     
     # Start the MCP server with streamable HTTP transport
-    mcp.run(transport="streamable-http", host=MCP_SERVER_HOST, port=MCP_SERVER_PORT)
+    try:
+        mcp.run(
+            transport="streamable-http",
+            host=MCP_SERVER_HOST,
+            port=MCP_SERVER_PORT,
+            uvicorn_config={
+                "timeout_keep_alive": MCP_KEEP_ALIVE,
+                "limit_concurrency": MCP_LIMIT_CONCURRENCY,
+            },
+        )
+    finally:
+        # Engines must be quit before interpreter shutdown joins their threads
+        _shutdown_engine()
 
 if __name__ == "__main__":
     start_chess_mcp_server()